@@ -1,33 +1,431 @@
+import bz2
+import gzip
+import io
 import json
 import logging
+import lzma
 import argparse
 import os
+import mmap
+import multiprocessing
+import queue
+import threading
+from typing import Optional
 
-# ijson is used for efficient streaming of large JSON files
+# ijson is used for efficient streaming of large JSON files; prefer the C backends
 try:
-    import ijson
+    import ijson.backends.yajl2_c as ijson
 except ImportError:
-    raise ImportError("Please install ijson (e.g., via pip install ijson) to run this script.")
+    try:
+        import ijson.backends.yajl2_cffi as ijson
+    except ImportError:
+        try:
+            import ijson
+        except ImportError:
+            raise ImportError("Please install ijson (e.g., via pip install ijson) to run this script.")
+
+# orjson is used for fast parsing and serialization when available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# msgspec decodes only the abstracts fields we use, skipping the rest at C speed
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if msgspec is not None:
+    class OidRef(msgspec.Struct):
+        oid: Optional[str] = msgspec.field(default=None, name="$oid")
+
+    class AbstractRec(msgspec.Struct):
+        id: Optional[OidRef] = msgspec.field(default=None, name="_id")
+        publication_doi: Optional[str] = None
+        publication_abstract_cleaned: Optional[str] = None
+
+    # Profiles are only checked for a null abstract, so keep it as undecoded JSON
+    _RAW_NULL = msgspec.Raw(b"null")
+
+    class ProfileRec(msgspec.Struct):
+        abstract: msgspec.Raw = _RAW_NULL
+        publication_id: Optional[OidRef] = None
+        publication_DOI: Optional[str] = None
+
+    _abstract_rec_decoder = msgspec.json.Decoder(AbstractRec)
+    _profile_rec_decoder = msgspec.json.Decoder(ProfileRec)
+    DECODE_ERRORS = (json.JSONDecodeError, msgspec.DecodeError)
+else:
+    DECODE_ERRORS = (json.JSONDecodeError,)
+
+# zstandard is only needed to read .zst compressed inputs
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressed inputs are decompressed on the fly based on their file extension
+DECOMPRESSORS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+# Output is written through large buffers so millions of small writes become few syscalls
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+# Serialized output is handed to writer threads in batches of roughly this many bytes
+WRITE_BATCH_SIZE = 1024 * 1024
+WRITE_QUEUE_DEPTH = 8
+# A reader thread keeps up to PREFETCH_DEPTH chunks queued ahead of the JSON parser
+PREFETCH_CHUNK_SIZE = 4 * 1024 * 1024
+PREFETCH_DEPTH = 4
+# ijson parses prefetched chunks in small slices; yajl2_c runs measurably slower on multi-MB buffers
+IJSON_BUF_SIZE = 64 * 1024
+# Smallest byte range handed to a parallel NDJSON scan worker
+MIN_SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+def json_loads(data):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects the NaN/Infinity literals the stdlib reads (and writes); retry there
+            pass
+    return json.loads(data)
+
+def json_dumps(obj, indent=False, exact=False):
+    # exact serializes with the stdlib so values it parsed (NaN, Infinity) are written back unchanged
+    if orjson is not None and not exact:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits; the stdlib path keeps them exact
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+def is_compressed(filepath):
+    ext = os.path.splitext(filepath)[1].lower()
+    return ext == '.zst' or ext in DECOMPRESSORS
+
+def open_input(filepath):
+    """Open an input file for binary reading, decompressing .gz/.bz2/.xz/.zst transparently."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == '.zst':
+        if zstandard is None:
+            raise ImportError("Please install zstandard (e.g., via pip install zstandard) to read .zst files.")
+        return zstandard.open(filepath, 'rb')
+    if ext in DECOMPRESSORS:
+        return DECOMPRESSORS[ext](filepath, 'rb')
+    return open(filepath, 'rb', buffering=0)
+
+def iter_prefetched_chunks(filepath):
+    """Yield the file in PREFETCH_CHUNK_SIZE chunks read ahead by a background thread."""
+    chunks = queue.Queue(maxsize=PREFETCH_DEPTH)
+    stop = threading.Event()
+
+    def reader():
+        try:
+            with open_input(filepath) as f:
+                while not stop.is_set():
+                    chunk = f.read(PREFETCH_CHUNK_SIZE)
+                    chunks.put(chunk)
+                    if not chunk:
+                        break
+        except Exception as e:
+            chunks.put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        # Unblock the reader if the consumer stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+class PrefetchedReader:
+    """Minimal binary file object whose read() serves chunks from iter_prefetched_chunks."""
+
+    def __init__(self, filepath):
+        self._chunks = iter_prefetched_chunks(filepath)
+        self._chunk = b""
+        self._pos = 0
+
+    def read(self, size=-1):
+        if size == 0:
+            return b""
+        if self._pos >= len(self._chunk):
+            self._chunk = next(self._chunks, b"")
+            self._pos = 0
+        if size < 0 or (self._pos == 0 and size >= len(self._chunk)):
+            data = self._chunk[self._pos:] if self._pos else self._chunk
+            self._chunk = b""
+            self._pos = 0
+            if size < 0:
+                return data + b"".join(self._chunks)
+            return data
+        data = self._chunk[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self._chunks.close()
+
+def iter_json_array(filepath, **config):
+    """Yield each element of a top-level JSON array, parsing prefetched chunks with ijson."""
+    reader = PrefetchedReader(filepath)
+    try:
+        yield from ijson.items(reader, 'item', buf_size=IJSON_BUF_SIZE, **config)
+    finally:
+        reader.close()
+
+def iter_ndjson_lines(filepath, start=0, end=None):
+    """Yield each line (without its newline) that starts within [start, end) of an NDJSON file."""
+    if is_compressed(filepath):
+        # Compressed streams cannot be memory-mapped or split into byte ranges
+        with open_input(filepath) as f:
+            for line in io.BufferedReader(f, PREFETCH_CHUNK_SIZE):
+                yield line.rstrip(b"\r\n")
+        return
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            if end is None or end > size:
+                end = size
+            pos = start
+            if start:
+                # Skip the line that straddles the range start; the previous range owns it
+                pos = mm.find(b"\n", start - 1)
+                if pos == -1:
+                    return
+                pos += 1
+            while pos < end:
+                nl = mm.find(b"\n", pos)
+                if nl == -1:
+                    nl = size
+                line = mm[pos:nl]
+                if line.endswith(b"\r"):
+                    # CRLF files: drop the \r too, matching the compressed branch above
+                    line = line.rstrip(b"\r")
+                yield line
+                pos = nl + 1
+
+def decode_abstract_record(line):
+    """Return (id, doi, abstract) from one NDJSON abstracts line."""
+    if msgspec is not None:
+        try:
+            rec = _abstract_rec_decoder.decode(line)
+        except msgspec.DecodeError:
+            # Unexpected field types or NaN/Infinity literals; let the dict path below handle the record
+            pass
+        else:
+            rec_id = rec.id.oid if rec.id is not None else None
+            return rec_id, rec.publication_doi, rec.publication_abstract_cleaned
+    rec = json_loads(line)
+    return rec.get('_id', {}).get('$oid'), rec.get('publication_doi'), rec.get('publication_abstract_cleaned')
+
+def decode_profile_keys(line):
+    """Return (missing abstract, publication id, DOI) from one NDJSON profile line."""
+    if msgspec is not None:
+        try:
+            rec = _profile_rec_decoder.decode(line)
+        except msgspec.DecodeError:
+            # Unexpected field types or NaN/Infinity literals; let the dict path below handle the record
+            pass
+        else:
+            pub_id = rec.publication_id.oid if rec.publication_id is not None else None
+            return rec.abstract == _RAW_NULL, pub_id, rec.publication_DOI
+    profile = json_loads(line)
+    return profile.get('abstract') is None, profile.get('publication_id', {}).get('$oid'), profile.get('publication_DOI')
+
+def doi_length_bounds(dois):
+    # A stripped ASCII DOI outside these bounds cannot match, so it is never lowercased
+    if not dois:
+        return 1, 0
+    return min(map(len, dois)), max(map(len, dois))
+
+class JsonArrayWriter:
+    """Stream serialized items into a JSON array file, writing batches on a background thread.
+
+    Output goes to a temporary sibling that only replaces filepath once the array is complete.
+    """
+
+    def __init__(self, filepath):
+        self.count = 0
+        self._path = filepath
+        self._tmp_path = filepath + ".tmp"
+        self._batch = [b"[\n"]
+        self._batch_size = 0
+        self._error = None
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_DEPTH)
+        self._file = open(self._tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is None:
+                try:
+                    self._file.write(data)
+                except Exception as e:
+                    self._error = e
+
+    def _flush_batch(self):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(b"".join(self._batch))
+        self._batch = []
+        self._batch_size = 0
+
+    def write(self, data):
+        if self.count:
+            self._batch.append(b",\n")
+        self._batch.append(data)
+        self.count += 1
+        self._batch_size += len(data)
+        if self._batch_size >= WRITE_BATCH_SIZE:
+            self._flush_batch()
+
+    def close(self, complete=True):
+        try:
+            if complete:
+                self._batch.append(b"\n]\n")
+                self._flush_batch()
+        except BaseException:
+            complete = False
+            raise
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            try:
+                self._file.close()
+            except Exception as e:
+                if self._error is None:
+                    self._error = e
+            if complete and self._error is None:
+                os.replace(self._tmp_path, self._path)
+            else:
+                os.remove(self._tmp_path)
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
 
 def detect_json_format(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
+    with open_input(filepath) as f:
         char = f.read(1)
         while char and char.isspace():
             char = f.read(1)
         if not char:
             return None
-        if char == '[':
+        if char == b'[':
             return 'array'
-        elif char == '{':
+        elif char == b'{':
             return 'ndjson'
         else:
             return None
 
+def cache_array_as_ndjson(filepath, cache_path):
+    # Write to a temporary sibling first so an interrupted run never leaves a truncated cache
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as out_f:
+        for rec in iter_json_array(filepath, use_float=True):
+            out_f.write(json_dumps(rec))
+            out_f.write(b"\n")
+    os.replace(tmp_path, cache_path)
+
+def find_ndjson_cache(filepath):
+    cache_path = filepath + ".ndjson"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(filepath):
+        return cache_path
+    return None
+
+# Needed keys are broadcast once per worker process by the pool initializer
+_worker_needed_ids = frozenset()
+_worker_needed_dois = frozenset()
+_worker_doi_bounds = (1, 0)
+
+def _init_scan_worker(needed_ids, needed_dois):
+    global _worker_needed_ids, _worker_needed_dois, _worker_doi_bounds
+    _worker_needed_ids = frozenset(needed_ids)
+    _worker_needed_dois = frozenset(needed_dois)
+    _worker_doi_bounds = doi_length_bounds(_worker_needed_dois)
+
+def _scan_abstracts_range(task):
+    # Scan NDJSON lines that start within [start, end) and return the first match per key
+    filepath, start, end = task
+    id_matches = {}
+    doi_matches = {}
+    min_doi_len, max_doi_len = _worker_doi_bounds
+    for line in iter_ndjson_lines(filepath, start, end):
+        try:
+            rec_id, doi, abstract_text = decode_abstract_record(line)
+        except DECODE_ERRORS:
+            continue
+        if rec_id in _worker_needed_ids and rec_id not in id_matches:
+            id_matches[rec_id] = abstract_text or ''
+        if doi:
+            doi_key = doi.strip()
+            if min_doi_len <= len(doi_key) <= max_doi_len or not doi_key.isascii():
+                doi_key = doi_key.lower()
+                if doi_key in _worker_needed_dois and doi_key not in doi_matches:
+                    doi_matches[doi_key] = abstract_text or ''
+    return id_matches, doi_matches
+
+def scan_abstracts_parallel(filepath, id_to_abstract, doi_to_abstract, remaining, workers):
+    file_size = os.stat(filepath).st_size
+    chunk_size = max(-(-file_size // (workers * 4)), MIN_SCAN_CHUNK_SIZE)
+    tasks = [(filepath, start, min(start + chunk_size, file_size))
+             for start in range(0, file_size, chunk_size)]
+    workers = max(1, min(workers, len(tasks)))
+    logging.info(f"Scanning {len(tasks)} chunks with {workers} worker processes...")
+    # frozensets pickle under every start method (spawn/forkserver cannot pickle dict views)
+    with multiprocessing.Pool(workers, initializer=_init_scan_worker,
+                              initargs=(frozenset(id_to_abstract), frozenset(doi_to_abstract))) as pool:
+        # imap yields chunks in file order, so the earliest record still wins per key
+        for id_matches, doi_matches in pool.imap(_scan_abstracts_range, tasks):
+            for rec_id, abstract_text in id_matches.items():
+                if id_to_abstract[rec_id] is None:
+                    id_to_abstract[rec_id] = abstract_text
+                    remaining -= 1
+            for doi_key, abstract_text in doi_matches.items():
+                if doi_to_abstract[doi_key] is None:
+                    doi_to_abstract[doi_key] = abstract_text
+                    remaining -= 1
+            if remaining == 0:
+                # Leaving the with block terminates workers still scanning later chunks
+                break
+
 def main():
     parser = argparse.ArgumentParser(description="Merge missing abstracts into profiles JSON.")
     parser.add_argument("raw_assets_file", help="Path to raw assets (profiles) JSON file")
     parser.add_argument("abstracts_file", help="Path to publications abstracts JSON file")
     parser.add_argument("output_dir", help="Path to output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for scanning an NDJSON abstracts file (default: CPU count)")
+    parser.add_argument("--cache-ndjson", action="store_true",
+                        help="Convert an array-format abstracts file to a sibling .ndjson cache reused by later runs")
+    parser.add_argument("--indent", action="store_true",
+                        help="Pretty-print each output profile with 2-space indentation (slower)")
     args = parser.parse_args()
 
     raw_file = args.raw_assets_file
@@ -38,150 +436,163 @@ def main():
     merged_only_output_path = os.path.join(output_dir, "only_merged_entries.json")
 
     logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
-    logging.info("Scanning raw assets file for profiles missing abstracts...")
+    logging.info(f"Using ijson backend: {ijson.backend}")
 
+    raw_format = detect_json_format(raw_file)
+    if raw_format is None:
+        logging.error("Unable to detect JSON format of raw assets file.")
+        return
+    big_format = detect_json_format(abstracts_file)
+    if big_format is None:
+        logging.error("Unable to detect JSON format of abstracts file.")
+        return
+
+    logging.info("Scanning raw assets file for profiles missing abstracts...")
     needed_ids = set()
     needed_dois = set()
-    raw_format = detect_json_format(raw_file)
     if raw_format == 'array':
-        with open(raw_file, 'rb') as f:
-            for profile in ijson.items(f, 'item'):
-                if profile.get('abstract') is None:
-                    pub_id = profile.get('publication_id', {}).get('$oid')
-                    if pub_id:
-                        needed_ids.add(pub_id)
-                    doi = profile.get('publication_DOI')
-                    if doi:
-                        needed_dois.add(doi.strip().lower())
-    elif raw_format == 'ndjson':
-        with open(raw_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    profile = json.loads(line)
-                except json.JSONDecodeError as e:
-                    logging.warning(f"Skipping invalid JSON line: {e}")
-                    continue
-                if profile.get('abstract') is None:
-                    pub_id = profile.get('publication_id', {}).get('$oid')
-                    if pub_id:
-                        needed_ids.add(pub_id)
-                    doi = profile.get('publication_DOI')
-                    if doi:
-                        needed_dois.add(doi.strip().lower())
+        for profile in iter_json_array(raw_file, use_float=True):
+            if profile.get('abstract') is None:
+                pub_id = profile.get('publication_id', {}).get('$oid')
+                if pub_id:
+                    needed_ids.add(pub_id)
+                doi = profile.get('publication_DOI')
+                if doi:
+                    needed_dois.add(doi.strip().lower())
     else:
-        logging.error("Unable to detect JSON format of raw assets file.")
-        return
+        for line in iter_ndjson_lines(raw_file):
+            try:
+                missing_abstract, pub_id, doi = decode_profile_keys(line)
+            except DECODE_ERRORS as e:
+                logging.warning(f"Skipping invalid JSON line: {e}")
+                continue
+            if missing_abstract:
+                if pub_id:
+                    needed_ids.add(pub_id)
+                if doi:
+                    needed_dois.add(doi.strip().lower())
 
     logging.info(f"Profiles needing abstracts: {len(needed_ids)} by ID, {len(needed_dois)} by DOI")
 
     logging.info("Scanning abstracts file for matching publication abstracts...")
-    id_to_abstract = {}
-    doi_to_abstract = {}
-    remaining_ids = set(needed_ids)
-    remaining_dois = set(needed_dois)
+    # None marks a needed key not yet seen; matched records store their abstract ('' if empty)
+    id_to_abstract = dict.fromkeys(needed_ids)
+    doi_to_abstract = dict.fromkeys(needed_dois)
+    remaining = len(id_to_abstract) + len(doi_to_abstract)
+    min_doi_len, max_doi_len = doi_length_bounds(needed_dois)
 
-    big_format = detect_json_format(abstracts_file)
-    if big_format == 'array':
-        with open(abstracts_file, 'rb') as f:
-            for rec in ijson.items(f, 'item'):
-                rec_id = rec.get('_id', {}).get('$oid')
-                if rec_id and rec_id in remaining_ids:
-                    abstract_text = rec.get('publication_abstract_cleaned')
-                    if abstract_text:
-                        id_to_abstract[rec_id] = abstract_text
-                    remaining_ids.discard(rec_id)
-                doi = rec.get('publication_doi')
-                if doi:
-                    doi_key = doi.strip().lower()
-                    if doi_key in remaining_dois:
-                        abstract_text = rec.get('publication_abstract_cleaned')
-                        if abstract_text:
-                            doi_to_abstract[doi_key] = abstract_text
-                        remaining_dois.discard(doi_key)
-                if not remaining_ids and not remaining_dois:
-                    break
-    elif big_format == 'ndjson':
-        with open(abstracts_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    rec = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                rec_id = rec.get('_id', {}).get('$oid')
-                if rec_id and rec_id in remaining_ids:
-                    abstract_text = rec.get('publication_abstract_cleaned')
-                    if abstract_text:
-                        id_to_abstract[rec_id] = abstract_text
-                    remaining_ids.discard(rec_id)
-                doi = rec.get('publication_doi')
-                if doi:
-                    doi_key = doi.strip().lower()
-                    if doi_key in remaining_dois:
-                        abstract_text = rec.get('publication_abstract_cleaned')
-                        if abstract_text:
-                            doi_to_abstract[doi_key] = abstract_text
-                        remaining_dois.discard(doi_key)
-                if not remaining_ids and not remaining_dois:
+    cache_path = find_ndjson_cache(abstracts_file) if big_format == 'array' else None
+    if cache_path is None and big_format == 'array' and args.cache_ndjson:
+        cache_path = abstracts_file + ".ndjson"
+        logging.info(f"Converting abstracts file to NDJSON cache: {cache_path}")
+        cache_array_as_ndjson(abstracts_file, cache_path)
+    if cache_path is not None:
+        logging.info(f"Using NDJSON cache of abstracts file: {cache_path}")
+        abstracts_file = cache_path
+        big_format = 'ndjson'
+    if remaining == 0:
+        logging.info("No profiles need abstracts; skipping abstracts scan.")
+    elif big_format == 'array':
+        for rec in iter_json_array(abstracts_file):
+            rec_id = rec.get('_id', {}).get('$oid')
+            if id_to_abstract.get(rec_id, '') is None:
+                id_to_abstract[rec_id] = rec.get('publication_abstract_cleaned') or ''
+                remaining -= 1
+                if remaining == 0:
                     break
+            doi = rec.get('publication_doi')
+            if doi:
+                doi_key = doi.strip()
+                if min_doi_len <= len(doi_key) <= max_doi_len or not doi_key.isascii():
+                    doi_key = doi_key.lower()
+                    if doi_to_abstract.get(doi_key, '') is None:
+                        doi_to_abstract[doi_key] = rec.get('publication_abstract_cleaned') or ''
+                        remaining -= 1
+                        if remaining == 0:
+                            break
+    elif (big_format == 'ndjson' and args.workers > 1 and not is_compressed(abstracts_file)
+          and os.path.getsize(abstracts_file) > MIN_SCAN_CHUNK_SIZE):
+        scan_abstracts_parallel(abstracts_file, id_to_abstract, doi_to_abstract, remaining, args.workers)
     else:
-        logging.error("Unable to detect JSON format of abstracts file.")
-        return
+        for line in iter_ndjson_lines(abstracts_file):
+            try:
+                rec_id, doi, abstract_text = decode_abstract_record(line)
+            except DECODE_ERRORS:
+                continue
+            if id_to_abstract.get(rec_id, '') is None:
+                id_to_abstract[rec_id] = abstract_text or ''
+                remaining -= 1
+                if remaining == 0:
+                    break
+            if doi:
+                doi_key = doi.strip()
+                if min_doi_len <= len(doi_key) <= max_doi_len or not doi_key.isascii():
+                    doi_key = doi_key.lower()
+                    if doi_to_abstract.get(doi_key, '') is None:
+                        doi_to_abstract[doi_key] = abstract_text or ''
+                        remaining -= 1
+                        if remaining == 0:
+                            break
 
+    # Keep only keys that will actually update a profile, so the write pass needs one probe per key
+    id_to_abstract = {rec_id: abstract_text for rec_id, abstract_text in id_to_abstract.items() if abstract_text}
+    doi_to_abstract = {doi_key: abstract_text for doi_key, abstract_text in doi_to_abstract.items() if abstract_text}
+    min_doi_len, max_doi_len = doi_length_bounds(doi_to_abstract)
     logging.info(f"Found abstracts for {len(id_to_abstract)} profiles by ID and {len(doi_to_abstract)} by DOI")
+    # Object IDs and normalized DOIs never collide, so one dict serves both lookups
+    abstract_by_key = {**doi_to_abstract, **id_to_abstract}
 
     logging.info("Writing updated profiles to output file...")
-    full_merged = []
-    only_merged = []
-
-    if raw_format == 'array':
-        with open(raw_file, 'rb') as f:
-            for profile in ijson.items(f, 'item'):
+    with JsonArrayWriter(full_output_path) as full_out, JsonArrayWriter(merged_only_output_path) as only_out:
+        if raw_format == 'array':
+            for profile in iter_json_array(raw_file, use_float=True):
                 updated = False
                 if profile.get('abstract') is None:
                     pub_id = profile.get('publication_id', {}).get('$oid')
-                    if pub_id and pub_id in id_to_abstract:
-                        profile['abstract'] = id_to_abstract[pub_id]
+                    abstract_text = abstract_by_key.get(pub_id)
+                    if abstract_text:
+                        profile['abstract'] = abstract_text
                         updated = True
                     else:
                         doi = profile.get('publication_DOI')
                         if doi:
-                            doi_key = doi.strip().lower()
-                            if doi_key in doi_to_abstract:
-                                profile['abstract'] = doi_to_abstract[doi_key]
-                                updated = True
-                full_merged.append(profile)
+                            doi_key = doi.strip()
+                            if min_doi_len <= len(doi_key) <= max_doi_len or not doi_key.isascii():
+                                abstract_text = abstract_by_key.get(doi_key.lower())
+                                if abstract_text:
+                                    profile['abstract'] = abstract_text
+                                    updated = True
+                data = json_dumps(profile, args.indent)
+                full_out.write(data)
                 if updated:
-                    only_merged.append(profile)
-    else:
-        with open(raw_file, 'r', encoding='utf-8') as f:
-            for line in f:
+                    only_out.write(data)
+        else:
+            for line in iter_ndjson_lines(raw_file):
                 try:
-                    profile = json.loads(line)
-                except json.JSONDecodeError:
+                    missing_abstract, pub_id, doi = decode_profile_keys(line)
+                except DECODE_ERRORS:
                     continue
-                updated = False
-                if profile.get('abstract') is None:
-                    pub_id = profile.get('publication_id', {}).get('$oid')
-                    if pub_id and pub_id in id_to_abstract:
-                        profile['abstract'] = id_to_abstract[pub_id]
-                        updated = True
-                    else:
-                        doi = profile.get('publication_DOI')
-                        if doi:
-                            doi_key = doi.strip().lower()
-                            if doi_key in doi_to_abstract:
-                                profile['abstract'] = doi_to_abstract[doi_key]
-                                updated = True
-                full_merged.append(profile)
-                if updated:
-                    only_merged.append(profile)
-
-    with open(full_output_path, 'w', encoding='utf-8') as out_f:
-        json.dump(full_merged, out_f, indent=2)
-
-    with open(merged_only_output_path, 'w', encoding='utf-8') as out_f:
-        json.dump(only_merged, out_f, indent=2)
+                abstract_text = None
+                if missing_abstract:
+                    abstract_text = abstract_by_key.get(pub_id)
+                    if not abstract_text and doi:
+                        doi_key = doi.strip()
+                        if min_doi_len <= len(doi_key) <= max_doi_len or not doi_key.isascii():
+                            abstract_text = abstract_by_key.get(doi_key.lower())
+                if abstract_text:
+                    # stdlib json keeps wide integers and NaN/Infinity exact, matching the lines copied through verbatim
+                    profile = json.loads(line)
+                    profile['abstract'] = abstract_text
+                    data = json_dumps(profile, args.indent, exact=True)
+                    full_out.write(data)
+                    only_out.write(data)
+                else:
+                    # Unchanged profiles are copied through without re-parsing or re-serializing
+                    if args.indent:
+                        line = json_dumps(json.loads(line), indent=True, exact=True)
+                    full_out.write(line)
 
+    logging.info(f"Wrote {full_out.count} profiles, {only_out.count} with merged abstracts")
     logging.info("Done.")
     logging.info(f"Full dataset written to: {full_output_path}")
     logging.info(f"Merged-only dataset written to: {merged_only_output_path}")